@@ -1,57 +1,241 @@
 import streamlit as st
+import pandas as pd
 import json
 import os
 import datetime
+import glob
+import hmac
+import mmap
+import tempfile
+import threading
 from hashlib import sha256
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
 
 # ---------------- Data Files ----------------
-PATIENT_FILE = "patients.json"
-DOCTOR_FILE = "doctors.json"
+PATIENT_DIR = "patients"  # one JSONL shard per month, e.g. patients/2025-10.jsonl
+DOCTOR_FILE = "doctors.jsonl"
 USER_FILE = "users.json"
+COUNTER_FILE = "counters.json"  # next free ID per collection
+STYLE_FILE = "style.css"
+
+ph = PasswordHasher()
 
 # ---------------- Load / Save JSON ----------------
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):  # stdlib json needs bytes or str
+        data = data.tobytes()
+    return json.loads(data)
+
+def json_dumps(obj, pretty=False):  # returns UTF-8 bytes with either backend
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else None)
+    if pretty:
+        return json.dumps(obj, indent=4).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+# Writes go to a temp file that replaces the target in one step, so the
+# file is never truncated under a reader (load_users memory-maps it)
+def save_json(file, data, pretty=False):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps(data, pretty))
+        os.replace(tmp, file)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+# Patient and doctor files are JSON Lines, one record per line, so adding
+# a record appends a single line instead of rewriting the whole file.
+# Parsed files are memoized by st.cache_data, keyed on filename and mtime
+# so edits made outside the app are picked up too. A write only drops the
+# entry for the file it changed; every other file stays cached.
+@st.cache_data(show_spinner=False)
+def _read_jsonl(file, mtime):
+    with open(file, "rb") as f:
+        return [json_loads(line) for line in f if line.strip()]
+
 def load_records(file):
     if os.path.exists(file):
-        with open(file, "r") as f:
-            return json.load(f)
+        return _read_jsonl(file, os.path.getmtime(file))
     return []
 
-def save_records(file, records):
-    with open(file, "w") as f:
-        json.dump(records, f, indent=4)
+def append_record(file, record):
+    old_mtime = os.path.getmtime(file) if os.path.exists(file) else None
+    with open(file, "ab") as f:
+        f.write(json_dumps(record) + b"\n")
+    if old_mtime is not None:
+        _read_jsonl.clear(file, old_mtime)
+
+# Sharded collections keep one file per YYYY-MM of the record timestamp,
+# so no single file grows without bound
+def shard_files(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.jsonl")))
+
+def load_sharded_records(directory):
+    records = []
+    for file in shard_files(directory):
+        records.extend(load_records(file))
+    return records
+
+def append_sharded_record(directory, record):
+    os.makedirs(directory, exist_ok=True)
+    append_record(os.path.join(directory, f"{record['timestamp'][:7]}.jsonl"), record)
+
+# (path, mtime) pairs; changes whenever any of the files is written,
+# created or removed, by this session or any other
+def files_version(files):
+    return tuple((file, os.path.getmtime(file)) for file in files if os.path.exists(file))
 
 # ---------------- User Functions ----------------
+# The parsed users dict is shared across reruns and sessions. Writes go to
+# a copy that replaces the shared dict only once the file is saved, so the
+# next login does not re-read the file just written.
+@st.cache_resource
+def _user_store():
+    return {"mtime": None, "users": {}}
+
 def load_users():
-    if os.path.exists(USER_FILE):
-        with open(USER_FILE, "r") as f:
-            data = json.load(f)
-            if isinstance(data, dict):  # Ensure it's a dict
-                return data
-            else:
-                return {}
-    return {}
+    if not os.path.exists(USER_FILE):
+        return {}
+    store = _user_store()
+    mtime = os.path.getmtime(USER_FILE)
+    if store["mtime"] != mtime:
+        data = {}
+        if os.path.getsize(USER_FILE):  # mmap cannot map an empty file
+            # Parse straight from the page cache rather than copying into a bytes object
+            with open(USER_FILE, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    data = json_loads(view)
+        store["users"] = data if isinstance(data, dict) else {}  # Ensure it's a dict
+        store["mtime"] = mtime
+    return store["users"]
 
 def save_users(users):
-    save_records(USER_FILE, users)
+    save_json(USER_FILE, users)
+    store = _user_store()
+    store["users"] = users
+    store["mtime"] = os.path.getmtime(USER_FILE)
+
+# Serializes read-copy-write of the shared users dict across session
+# threads, so concurrent sign-ups or hash upgrades can't drop each other
+@st.cache_resource
+def _user_lock():
+    return threading.Lock()
+
+def set_user_hash(username, password_hash, only_if_new=False):
+    with _user_lock():
+        users = load_users()
+        if only_if_new and username in users:
+            return False
+        users = dict(users)  # never mutate the shared dict before the write succeeds
+        users[username] = password_hash
+        save_users(users)
+    return True
 
 def hash_password(password):
-    return sha256(password.encode()).hexdigest()
+    return ph.hash(password)
+
+def verify_legacy_password(stored, password):
+    # Accounts created before argon2 hold an unsalted SHA-256 hex digest
+    return hmac.compare_digest(stored, sha256(password.encode()).hexdigest())
 
 def verify_user(username, password):
     users = load_users()
-    return username in users and users[username] == hash_password(password)
+    stored = users.get(username)
+    if stored is None:
+        return False
+    if stored.startswith("$argon2"):
+        try:
+            ph.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if not ph.check_needs_rehash(stored):
+            return True
+    elif not verify_legacy_password(stored, password):
+        return False
+    # Upgrade legacy or outdated hashes on successful login
+    set_user_hash(username, hash_password(password))
+    return True
 
 def add_user(username, password):
     users = load_users()
     if username in users:
         return False
-    users[username] = hash_password(password)
-    save_users(users)
-    return True
+    # Hash outside the lock; set_user_hash re-checks the name under it
+    return set_user_hash(username, hash_password(password), only_if_new=True)
+
+# Names are lowercased once when the frame is built, not on every search
+def build_frame(records):
+    df = pd.DataFrame(records)
+    if not df.empty:
+        df["name_lower"] = df["name"].str.lower()
+    return df
 
-# ---------------- Initialize Data ----------------
-patients = load_records(PATIENT_FILE)
-doctors = load_records(DOCTOR_FILE)
+def filter_by_name(records, df, search_name):
+    if not search_name:
+        return records
+    mask = df["name_lower"].str.contains(search_name.lower(), regex=False, na=False)
+    return df.loc[mask].drop(columns="name_lower").to_dict("records")
+
+# ---------------- Record IDs ----------------
+# IDs are handed out from COUNTER_FILE, shared by every session, so two
+# users adding records at the same time never get the same ID. The lock
+# serializes the read-increment-write across the server's session threads.
+@st.cache_resource
+def _counter_lock():
+    return threading.Lock()
+
+def next_id(collection, load_existing):
+    with _counter_lock():
+        counters = {}
+        if os.path.exists(COUNTER_FILE):
+            with open(COUNTER_FILE, "rb") as f:
+                counters = json_loads(f.read())
+        if collection not in counters:
+            # Seed from the stored records the first time a collection is used
+            counters[collection] = max((r["id"] for r in load_existing()), default=0) + 1
+        value = counters[collection]
+        counters[collection] = value + 1
+        save_json(COUNTER_FILE, counters)
+    return value
+
+# ---------------- Session Data ----------------
+# Records are loaded into the session on first use, so pages that don't
+# need them skip the read. The session copy is rebuilt whenever the files
+# change on disk, so records added from other sessions show up too.
+def get_patients():
+    version = files_version(shard_files(PATIENT_DIR))
+    if st.session_state.get("patients_version") != version:
+        st.session_state.patients = load_sharded_records(PATIENT_DIR)
+        st.session_state.patients_version = version
+        st.session_state.pop("df_patients", None)
+    return st.session_state.patients
+
+def get_doctors():
+    version = files_version([DOCTOR_FILE])
+    if st.session_state.get("doctors_version") != version:
+        doctors = load_records(DOCTOR_FILE)
+        st.session_state.doctors = doctors
+        st.session_state.doctor_names = [d['name'] for d in doctors]
+        st.session_state.doctors_version = version
+        st.session_state.pop("df_doctors", None)
+    return st.session_state.doctors
+
+# DataFrame views back the vectorized name search; dropped when the records
+# are reloaded and rebuilt the next time a View page needs them
+def get_frame(key, records):
+    if key not in st.session_state:
+        st.session_state[key] = build_frame(records)
+    return st.session_state[key]
 
 # ---------------- Session State ----------------
 if "logged_in" not in st.session_state:
@@ -62,16 +246,14 @@ if "username" not in st.session_state:
 # ---------------- Streamlit Config ----------------
 st.set_page_config(page_title="Hospital Management System", page_icon="🏥", layout="wide")
 
-# Common CSS
-st.markdown("""
-<style>
-body { background: linear-gradient(to right, #e6f7ff, #f0faff); font-family: 'Segoe UI', sans-serif; }
-h1 { text-align: center; color: #0073e6; font-size: 3rem; margin-bottom: 40px; }
-.page-card { background: white; border-radius: 25px; padding: 30px; margin-bottom: 30px; box-shadow: 0 10px 25px rgba(0,0,0,0.1); }
-.stButton>button { background-color: #0073e6; color:white; padding:10px 20px; border-radius:10px; font-weight:bold; }
-.stButton>button:hover { background-color:#005bb5; }
-</style>
-""", unsafe_allow_html=True)
+# Common CSS (Streamlit drops elements that are not re-rendered, so the
+# style tag is still emitted on every rerun; only the file read is cached)
+@st.cache_resource
+def load_css():
+    with open(STYLE_FILE, "r") as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # ---------------- Login / Sign Up ----------------
 if not st.session_state.logged_in:
@@ -119,20 +301,20 @@ if st.session_state.logged_in:
     elif menu == "Add Patient":
         st.markdown('<div class="page-card">', unsafe_allow_html=True)
         st.subheader("Add New Patient")
+        get_doctors()
         with st.form("patient_form"):
             name = st.text_input("Patient Name")
             age = st.number_input("Age", min_value=0, max_value=120)
             gender = st.selectbox("Gender", ["Male", "Female", "Other"])
             city = st.text_input("City")
-            doctor = st.selectbox("Assign Doctor", [d['name'] for d in doctors] if doctors else ["No doctor available"])
+            doctor = st.selectbox("Assign Doctor", st.session_state.doctor_names or ["No doctor available"])
             submitted = st.form_submit_button("Add Patient")
 
         if submitted:
             if name and city and doctor and doctor != "No doctor available":
-                patient_id = len(patients) + 1
-                data = {"id": patient_id, "name": name, "age": age, "gender": gender, "city": city, "doctor": doctor, "timestamp": str(datetime.datetime.now())}
-                patients.append(data)
-                save_records(PATIENT_FILE, patients)
+                patient_id = next_id("patients", lambda: load_sharded_records(PATIENT_DIR))
+                data = {"id": patient_id, "name": name, "age": age, "gender": gender, "city": city, "doctor": doctor, "timestamp": datetime.datetime.now().isoformat(timespec="seconds")}
+                append_sharded_record(PATIENT_DIR, data)
                 st.success(f"✅ Patient {name} added successfully with ID {patient_id}!")
             else:
                 st.warning("⚠ Please fill all fields and select a doctor.")
@@ -142,20 +324,23 @@ if st.session_state.logged_in:
     elif menu == "View Patients":
         st.markdown('<div class="page-card">', unsafe_allow_html=True)
         st.subheader("All Patients")
+        patients = get_patients()
         if not patients:
             st.info("No patient records found.")
         else:
             search_name = st.text_input("Search by Name")
-            filtered_patients = [p for p in patients if search_name.lower() in p['name'].lower()]
-            for p in filtered_patients:
-                st.markdown(f"""
-                    <div style='background:#e6f7ff;padding:15px;border-radius:15px;margin-bottom:10px;'>
-                    <h4 style='margin:0;color:#0073e6;'>Patient #{p['id']} - {p['name']}</h4>
-                    <p><strong>Age:</strong> {p['age']}, <strong>Gender:</strong> {p['gender']}</p>
-                    <p><strong>City:</strong> {p['city']}, <strong>Doctor:</strong> {p['doctor']}</p>
-                    <p style='font-size:0.8em;color:gray;'>Added on: {p['timestamp']}</p>
-                    </div>
-                """, unsafe_allow_html=True)
+            filtered_patients = filter_by_name(patients, get_frame("df_patients", patients), search_name)
+            # One markdown element for all cards instead of one per patient
+            cards = "".join(
+                f"<div style='background:#e6f7ff;padding:15px;border-radius:15px;margin-bottom:10px;'>"
+                f"<h4 style='margin:0;color:#0073e6;'>Patient #{p['id']} - {p['name']}</h4>"
+                f"<p><strong>Age:</strong> {p['age']}, <strong>Gender:</strong> {p['gender']}</p>"
+                f"<p><strong>City:</strong> {p['city']}, <strong>Doctor:</strong> {p['doctor']}</p>"
+                f"<p style='font-size:0.8em;color:gray;'>Added on: {p['timestamp']}</p>"
+                f"</div>"
+                for p in filtered_patients
+            )
+            st.markdown(cards, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # ---------------- Add Doctor ----------------
@@ -170,10 +355,9 @@ if st.session_state.logged_in:
 
         if submitted:
             if name and specialization and city:
-                doctor_id = len(doctors) + 1
-                data = {"id": doctor_id, "name": name, "specialization": specialization, "city": city, "timestamp": str(datetime.datetime.now())}
-                doctors.append(data)
-                save_records(DOCTOR_FILE, doctors)
+                doctor_id = next_id("doctors", lambda: load_records(DOCTOR_FILE))
+                data = {"id": doctor_id, "name": name, "specialization": specialization, "city": city, "timestamp": datetime.datetime.now().isoformat(timespec="seconds")}
+                append_record(DOCTOR_FILE, data)
                 st.success(f"✅ Doctor {name} added successfully with ID {doctor_id}!")
             else:
                 st.warning("⚠ Please fill all fields.")
@@ -183,20 +367,22 @@ if st.session_state.logged_in:
     elif menu == "View Doctors":
         st.markdown('<div class="page-card">', unsafe_allow_html=True)
         st.subheader("All Doctors")
+        doctors = get_doctors()
         if not doctors:
             st.info("No doctor records found.")
         else:
             search_name = st.text_input("Search by Name")
-            filtered_doctors = [d for d in doctors if search_name.lower() in d['name'].lower()]
-            for d in filtered_doctors:
-                st.markdown(f"""
-                    <div style='background:#f0faff;padding:15px;border-radius:15px;margin-bottom:10px;'>
-                    <h4 style='margin:0;color:#0073e6;'>Doctor #{d['id']} - {d['name']}</h4>
-                    <p><strong>Specialization:</strong> {d['specialization']}</p>
-                    <p><strong>City:</strong> {d['city']}</p>
-                    <p style='font-size:0.8em;color:gray;'>Added on: {d['timestamp']}</p>
-                    </div>
-                """, unsafe_allow_html=True)
+            filtered_doctors = filter_by_name(doctors, get_frame("df_doctors", doctors), search_name)
+            cards = "".join(
+                f"<div style='background:#f0faff;padding:15px;border-radius:15px;margin-bottom:10px;'>"
+                f"<h4 style='margin:0;color:#0073e6;'>Doctor #{d['id']} - {d['name']}</h4>"
+                f"<p><strong>Specialization:</strong> {d['specialization']}</p>"
+                f"<p><strong>City:</strong> {d['city']}</p>"
+                f"<p style='font-size:0.8em;color:gray;'>Added on: {d['timestamp']}</p>"
+                f"</div>"
+                for d in filtered_doctors
+            )
+            st.markdown(cards, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # ---------------- Logout ----------------